@@ -7,18 +7,389 @@ from datetime import datetime
 import shutil
 from pathlib import Path
 import asyncio
+import time
+import uuid
+import socket
+import argparse
+import multiprocessing
+import hashlib
+import functools
+import re
+import struct
+import zipfile
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from appwrite.client import Client
 from appwrite.services.storage import Storage
 from appwrite.services.databases import Databases
 from appwrite.id import ID
 from appwrite.input_file import InputFile
 from appwrite.query import Query
+from appwrite.exception import AppwriteException
 
 # Configuration
 APP_NAME = "DocVault"
 DB_NAME = "docvault.db"
 LOCAL_VAULT_DIR = "docvault_files"
 SYNC_INTERVAL = 300  # 5 minutes in seconds
+LOCK_DIR = os.path.join(LOCAL_VAULT_DIR, ".locks")
+CLAIM_LEASE = 600  # seconds a worker owns a claimed sync job
+CLAIM_RENEW_INTERVAL = CLAIM_LEASE / 3  # seconds between lease renewals during an upload
+CHANGE_POLL_INTERVAL = 2  # seconds between checks for other processes' writes
+WORKER_POLL_INTERVAL = 30  # seconds a headless worker idles between sync passes
+FILE_COLUMNS = "id, name, type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status"
+EXTRACT_CPU_SHARE = 0.5  # fraction of CPU cores the extraction pool may use
+EXTRACT_WORKERS = max(1, int((os.cpu_count() or 1) * EXTRACT_CPU_SHARE))
+EXTRACT_BATCH_SIZE = EXTRACT_WORKERS * 2  # files in flight per extraction pass
+EXTRACT_POLL_INTERVAL = 5  # seconds between checks for files awaiting extraction
+EXTRACT_LEASE = 600  # seconds a process owns a claimed extraction batch
+EXTRACT_RENEW_INTERVAL = EXTRACT_LEASE / 3  # seconds between renewals of a running batch
+EXTRACT_NICENESS = 10  # scheduling penalty for extraction processes
+EXTRACT_TEXT_LIMIT = 100_000  # characters of text kept per file
+HASH_CHUNK_SIZE = 1024 * 1024
+PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?!s)")
+PDF_SCAN_OVERLAP = 64  # bytes carried between chunks so no page marker is split
+SCRUB_BATCH_SIZE = 100  # files read from the database per query
+SCRUB_WORKERS = 4  # threads verifying files in parallel
+SCRUB_RATE_LIMIT = 50  # default scrub read rate in MB/s
+SCRUB_ORPHAN_GRACE = 3600  # seconds before an unreferenced blob counts as orphaned
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF text extraction is optional
+    PdfReader = None
+
+# Leading bytes of common formats, checked in order
+MAGIC_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"\x1f\x8b\x08", "application/gzip"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+]
+
+# Short signatures that ordinary text can start with. These must pass
+# weak_signature_matches and lose to a text/* guess from the file name.
+WEAK_MAGIC_SIGNATURES = [
+    (b"BM", "image/bmp"),
+    (b"ID3", "audio/mpeg"),
+    (b"OggS", "audio/ogg"),
+    (b"fLaC", "audio/flac"),
+    (b"{\\rtf", "application/rtf"),
+    (b"%!PS", "application/postscript"),
+]
+WEAK_MAGIC_TYPES = {mime for _, mime in WEAK_MAGIC_SIGNATURES}
+BMP_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+OLE_TYPES = {"application/msword", "application/vnd.ms-excel", "application/vnd.ms-powerpoint"}
+
+# Office Open XML documents are zip files told apart by their top-level folder
+OOXML_TYPES = {
+    "word/": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xl/": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ppt/": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+FILE_ICONS = {
+    "application/pdf": ft.Icons.PICTURE_AS_PDF,
+    "application/msword": ft.Icons.DESCRIPTION,
+    "application/rtf": ft.Icons.DESCRIPTION,
+    OOXML_TYPES["word/"]: ft.Icons.DESCRIPTION,
+    "application/vnd.ms-excel": ft.Icons.TABLE_CHART,
+    OOXML_TYPES["xl/"]: ft.Icons.TABLE_CHART,
+    "application/vnd.ms-powerpoint": ft.Icons.SLIDESHOW,
+    OOXML_TYPES["ppt/"]: ft.Icons.SLIDESHOW,
+    "application/zip": ft.Icons.ARCHIVE,
+    "application/gzip": ft.Icons.ARCHIVE,
+    "application/x-tar": ft.Icons.ARCHIVE,
+    "application/x-7z-compressed": ft.Icons.ARCHIVE,
+    "application/vnd.rar": ft.Icons.ARCHIVE,
+}
+# Fallback for types missing above, such as application/x-zip-compressed
+# or application/vnd.ms-excel.sheet.macroEnabled.12; first keyword found wins
+MIME_KEYWORD_ICONS = [
+    ("pdf", ft.Icons.PICTURE_AS_PDF),
+    ("image", ft.Icons.IMAGE),
+    ("word", ft.Icons.DESCRIPTION),
+    ("excel", ft.Icons.TABLE_CHART),
+    ("spreadsheet", ft.Icons.TABLE_CHART),
+    ("powerpoint", ft.Icons.SLIDESHOW),
+    ("presentation", ft.Icons.SLIDESHOW),
+    ("text", ft.Icons.TEXT_SNIPPET),
+    ("plain", ft.Icons.TEXT_SNIPPET),
+    ("zip", ft.Icons.ARCHIVE),
+    ("compressed", ft.Icons.ARCHIVE),
+]
+
+
+class VaultLock:
+    """Advisory cross-process lock backed by a file in LOCK_DIR"""
+    def __init__(self, name):
+        self.path = Path(LOCK_DIR) / f"{name}.lock"
+        self.handle = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self.handle.seek(0)
+                    msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self.handle, fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+
+class ScrubStopped(Exception):
+    """Raised inside scrub threads when the scrub's time budget runs out"""
+
+
+class RateLimiter:
+    """Token bucket shared between threads to cap read throughput"""
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.allowance = bytes_per_second
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        """Account for amount bytes, sleeping if the rate has been exceeded"""
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= amount
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+@functools.lru_cache(maxsize=None)
+def file_icon_for(file_type):
+    """Map a MIME type to its icon, memoized per distinct type"""
+    if not file_type:
+        return ft.Icons.INSERT_DRIVE_FILE
+    file_type = file_type.lower()
+    if file_type in FILE_ICONS:
+        return FILE_ICONS[file_type]
+    for keyword, icon in MIME_KEYWORD_ICONS:
+        if keyword in file_type:
+            return icon
+    return ft.Icons.INSERT_DRIVE_FILE
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def weak_signature_matches(head, mime):
+    """Check the header fields that follow a short magic signature"""
+    if mime == "image/bmp":
+        return len(head) >= 18 and struct.unpack("<I", head[14:18])[0] in BMP_HEADER_SIZES
+    if mime == "audio/mpeg":
+        return len(head) >= 10 and head[3] in (2, 3, 4) and head[4] == 0
+    if mime == "audio/ogg":
+        return len(head) > 5 and head[4] == 0
+    if mime == "audio/flac":
+        return len(head) > 4 and head[4] & 0x7F == 0
+    return True
+
+def sniff_magic(file_path):
+    """Detect a file's MIME type from its magic bytes alone.
+    
+    Content the bytes cannot settle is reported as a placeholder for
+    resolve_mime to refine by file name: application/x-ole-storage for
+    legacy Office containers, text/plain for anything that decodes as text,
+    and application/octet-stream for other data.
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(8192)
+    if not head:
+        return "application/octet-stream"
+    
+    for signature, mime in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    for signature, mime in WEAK_MAGIC_SIGNATURES:
+        if head.startswith(signature) and weak_signature_matches(head, mime):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                for entry in archive.namelist():
+                    for folder, mime in OOXML_TYPES.items():
+                        if entry.startswith(folder):
+                            return mime
+        except zipfile.BadZipFile:
+            pass
+        return "application/zip"
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        return "application/x-ole-storage"
+    if b"\x00" not in head:
+        try:
+            head.decode("utf-8")
+        except UnicodeDecodeError as e:
+            # A multi-byte character may be cut off at the end of the sample
+            if e.start < len(head) - 3:
+                return "application/octet-stream"
+        return "text/plain"
+    return "application/octet-stream"
+
+def resolve_mime(magic_type, file_name):
+    """Refine a sniff_magic result with the type guessed from a file's name"""
+    guessed, _ = mimetypes.guess_type(file_name)
+    if magic_type in WEAK_MAGIC_TYPES:
+        # Short signatures lose to a name that says the file is text
+        return guessed if guessed and guessed.startswith("text/") else magic_type
+    if magic_type == "application/x-ole-storage":
+        # Legacy Office compound file; the container does not say which app
+        return guessed if guessed in OLE_TYPES else magic_type
+    if magic_type == "text/plain":
+        # Text-based formats such as JSON, XML and SVG keep their named type
+        return guessed or magic_type
+    if magic_type == "application/octet-stream":
+        return guessed or magic_type
+    return magic_type
+
+def image_dimensions(head):
+    """Read (width, height) from an image header, or (None, None)"""
+    if head.startswith(b"\x89PNG") and len(head) >= 24:
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+        return struct.unpack("<HH", head[6:10])
+    if head.startswith(b"BM") and len(head) >= 26:
+        width, height = struct.unpack("<ii", head[18:26])
+        return width, abs(height)
+    if head.startswith(b"\xff\xd8"):
+        # Walk JPEG segments until a start-of-frame marker
+        offset = 2
+        while offset + 9 < len(head):
+            if head[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = head[offset + 1]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+                return width, height
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            offset += 2 + struct.unpack(">H", head[offset + 2:offset + 4])[0]
+    return None, None
+
+def count_pdf_pages(file_path):
+    """Count page objects in a PDF without loading it into memory"""
+    count = 0
+    tail = b""
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            buffer = tail + chunk
+            # Matches starting in the last PDF_SCAN_OVERLAP bytes are counted next time
+            cut = max(len(buffer) - PDF_SCAN_OVERLAP, 0)
+            count += sum(1 for match in PDF_PAGE_PATTERN.finditer(buffer) if match.start() < cut)
+            tail = buffer[cut:]
+    return count + len(PDF_PAGE_PATTERN.findall(tail))
+
+def extract_content(file_path):
+    """Sniff and extract searchable metadata from one file.
+    
+    Runs inside the extraction process pool, so it only touches the file.
+    Nothing here depends on the file name, so results can be cached by
+    content hash; "mime" is the sniff_magic result.
+    """
+    mime = sniff_magic(file_path)
+    result = {"mime": mime, "page_count": None, "width": None, "height": None, "text": None}
+    
+    if mime.startswith("image/"):
+        with open(file_path, "rb") as f:
+            # JPEG metadata can push the frame header well past the first block
+            head = f.read(256 * 1024)
+        result["width"], result["height"] = image_dimensions(head)
+    elif mime == "application/pdf":
+        if PdfReader:
+            reader = PdfReader(file_path)
+            result["page_count"] = len(reader.pages)
+            text = []
+            for pdf_page in reader.pages:
+                text.append(pdf_page.extract_text() or "")
+                if sum(len(t) for t in text) >= EXTRACT_TEXT_LIMIT:
+                    break
+            result["text"] = "\n".join(text)[:EXTRACT_TEXT_LIMIT]
+        else:
+            result["page_count"] = count_pdf_pages(file_path)
+    elif mime in OOXML_TYPES.values():
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            if "docProps/app.xml" in names:
+                pages = re.search(rb"<(?:Pages|Slides)>(\d+)<", archive.read("docProps/app.xml"))
+                if pages:
+                    result["page_count"] = int(pages.group(1))
+            if "word/document.xml" in names:
+                xml = archive.read("word/document.xml").decode("utf-8", errors="replace")
+                xml = re.sub(r"</w:p>", "\n", xml)
+                result["text"] = re.sub(r"<[^>]+>", "", xml)[:EXTRACT_TEXT_LIMIT]
+    elif mime.startswith("text/"):
+        with open(file_path, "rb") as f:
+            result["text"] = f.read(EXTRACT_TEXT_LIMIT).decode("utf-8", errors="replace")
+    
+    return result
+
+def file_digests(file_path, limiter=None, stop=None):
+    """Return the SHA-256 and MD5 hex digests of a file in one read.
+    
+    Raises ScrubStopped between chunks once the stop event is set.
+    """
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            if stop and stop.is_set():
+                raise ScrubStopped(file_path)
+            if limiter:
+                limiter.consume(len(chunk))
+            sha256.update(chunk)
+            md5.update(chunk)
+    return sha256.hexdigest(), md5.hexdigest()
+
+def lower_extract_priority():
+    """Process pool initializer that keeps extraction behind interactive work"""
+    if hasattr(os, "nice"):
+        os.nice(EXTRACT_NICENESS)
+
 
 class DocumentVault:
     def __init__(self, page: ft.Page):
@@ -34,6 +405,8 @@ class DocumentVault:
         self.last_sync_time = 0
         self.online = False
         self.sync_in_progress = False
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.extract_inflight = {}
         
         # Initialize databases and directories
         self.init_local_storage()
@@ -50,6 +423,16 @@ class DocumentVault:
         
         # Periodic sync
         self.page.run_task(self.periodic_sync)
+        
+        # Pick up writes made by other processes sharing the vault
+        self.page.run_task(self.watch_vault_changes)
+        
+        # Background content extraction
+        self.extract_pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            initializer=lower_extract_priority
+        )
+        self.page.run_task(self.run_extraction)
     
     # Replace your init_local_storage method with this thread-safe version:
     def init_local_storage(self):
@@ -58,38 +441,113 @@ class DocumentVault:
         self.local_vault_path = Path(LOCAL_VAULT_DIR)
         self.local_vault_path.mkdir(exist_ok=True)
         
-        # Initialize SQLite database with check_same_thread=False
-        self.local_db = sqlite3.connect(DB_NAME, check_same_thread=False)
-        cursor = self.local_db.cursor()
+        # Initialize SQLite database with check_same_thread=False.
+        # WAL and a busy timeout let several processes share the database.
+        self.local_db = sqlite3.connect(DB_NAME, check_same_thread=False, timeout=30)
         
-        # Create tables if they don't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                type TEXT,
-                size INTEGER,
-                folder TEXT,
-                tags TEXT,
-                uploaded_at TEXT,
-                local_path TEXT,
-                cloud_id TEXT,
-                sync_status TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS folders (
-                name TEXT PRIMARY KEY
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tags (
-                name TEXT PRIMARY KEY
-            )
-        ''')
-        
-        self.local_db.commit()
+        # Hold the schema lock so processes starting together don't race the migration
+        with VaultLock("schema"):
+            cursor = self.local_db.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            
+            # Create tables if they don't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    type TEXT,
+                    size INTEGER,
+                    folder TEXT,
+                    tags TEXT,
+                    uploaded_at TEXT,
+                    local_path TEXT,
+                    cloud_id TEXT,
+                    sync_status TEXT,
+                    claimed_by TEXT,
+                    claim_expires REAL,
+                    content_hash TEXT,
+                    page_count INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    extracted_text TEXT,
+                    extract_status TEXT DEFAULT 'pending',
+                    extract_claimed_by TEXT,
+                    extract_expires REAL
+                )
+            ''')
+            
+            # Add columns to databases created before they existed
+            cursor.execute("PRAGMA table_info(files)")
+            columns = {row[1] for row in cursor.fetchall()}
+            for column, definition in [
+                ("claimed_by", "TEXT"),
+                ("claim_expires", "REAL"),
+                ("content_hash", "TEXT"),
+                ("page_count", "INTEGER"),
+                ("width", "INTEGER"),
+                ("height", "INTEGER"),
+                ("extracted_text", "TEXT"),
+                ("extract_status", "TEXT DEFAULT 'pending'"),
+                ("extract_claimed_by", "TEXT"),
+                ("extract_expires", "REAL"),
+            ]:
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE files ADD COLUMN {column} {definition}")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_sync_status ON files (sync_status)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_extract_status ON files (extract_status)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files (content_hash)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_type ON files (type)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_page_count ON files (page_count)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_dimensions ON files (width, height)")
+            
+            # Extraction results keyed by content hash, so identical files are processed once
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS extractions (
+                    content_hash TEXT PRIMARY KEY,
+                    mime TEXT,
+                    page_count INTEGER,
+                    width INTEGER,
+                    height INTEGER,
+                    text TEXT
+                )
+            ''')
+            
+            # Full-text index over extracted text, one row per file
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'files_fts'")
+            fts_exists = cursor.fetchone() is not None
+            try:
+                cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(file_id UNINDEXED, text)")
+                self.fts_enabled = True
+            except sqlite3.OperationalError as e:
+                print(f"Full-text search unavailable ({e}), falling back to LIKE")
+                self.fts_enabled = False
+            if self.fts_enabled and not fts_exists:
+                cursor.execute('''
+                    INSERT INTO files_fts (file_id, text)
+                    SELECT id, extracted_text FROM files WHERE extracted_text IS NOT NULL
+                ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS folders (
+                    name TEXT PRIMARY KEY
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tags (
+                    name TEXT PRIMARY KEY
+                )
+            ''')
+            
+            # Scrub checkpoint, so interrupted scrubs resume where they stopped
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scrub_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            
+            self.local_db.commit()
     
     def init_appwrite_client(self):
         """Initialize Appwrite client (optional if offline)"""
@@ -246,28 +704,31 @@ class DocumentVault:
             file_type, _ = mimetypes.guess_type(file_path)
             file_id = str(datetime.now().timestamp())
             
-            # Create local copy
+            # Create local copy. The row is committed before the blob lock is
+            # released, so a scrub never sees the blob without its row.
             local_path = self.local_vault_path / f"{file_id}_{file_name}"
-            shutil.copy2(file_path, local_path)
             
-            # Add to local database
-            cursor = self.local_db.cursor()
-            cursor.execute('''
-                INSERT INTO files (id, name, type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                file_id,
-                file_name,
-                file_type,
-                file_size,
-                self.current_folder,
-                ",".join(self.selected_tags),
-                datetime.now().isoformat(),
-                str(local_path),
-                None,  # No cloud ID yet
-                "new" if self.online else "offline"
-            ))
-            self.local_db.commit()
+            def record_file():
+                cursor = self.local_db.cursor()
+                cursor.execute('''
+                    INSERT INTO files (id, name, type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    file_id,
+                    file_name,
+                    file_type,
+                    file_size,
+                    self.current_folder,
+                    ",".join(self.selected_tags),
+                    datetime.now().isoformat(),
+                    str(local_path),
+                    None,  # No cloud ID yet
+                    "new" if self.online else "offline"
+                ))
+                self.local_db.commit()
+            
+            # copyfile rather than copy2, so the blob's mtime is the time it was added
+            self.write_blob(local_path, lambda tmp_path: shutil.copyfile(file_path, tmp_path), record_file)
             
             # If online, try to sync immediately
             if self.online:
@@ -281,6 +742,23 @@ class DocumentVault:
         finally:
             self.page.update()
     
+    def write_blob(self, local_path, write, record=None):
+        """Write a vault blob atomically while holding its advisory lock.
+        
+        record, if given, runs before the lock is released so the database
+        row referencing the blob is committed while no scrub can remove it.
+        """
+        tmp_path = local_path.with_name(f".{local_path.name}.part")
+        with VaultLock(local_path.name):
+            try:
+                write(tmp_path)
+                os.replace(tmp_path, local_path)
+                if record:
+                    record()
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+    
     # main_final_fixed.py
     def load_files(self):
         """Load files from local database with current filters"""
@@ -290,12 +768,18 @@ class DocumentVault:
             cursor = self.local_db.cursor()
 
             # Build query
-            query = "SELECT * FROM files WHERE folder = ?"
+            query = f"SELECT {FILE_COLUMNS} FROM files WHERE folder = ?"
             params = [self.current_folder]
 
             if self.search_query:
-                query += " AND name LIKE ?"
-                params.append(f"%{self.search_query}%")
+                if self.fts_enabled:
+                    # Quote each term so user input is never parsed as FTS syntax
+                    terms = " ".join('"' + term.replace('"', '""') + '"*' for term in self.search_query.split())
+                    query += " AND (name LIKE ? OR id IN (SELECT file_id FROM files_fts WHERE files_fts MATCH ?))"
+                    params.extend([f"%{self.search_query}%", terms])
+                else:
+                    query += " AND (name LIKE ? OR extracted_text LIKE ?)"
+                    params.extend([f"%{self.search_query}%"] * 2)
 
             if self.selected_tags:
                 tag_conditions = []
@@ -369,26 +853,7 @@ class DocumentVault:
     
     def get_file_icon(self, file_type):
         """Get appropriate icon based on file type"""
-        if not file_type:
-            return ft.Icons.INSERT_DRIVE_FILE
-        
-        file_type = file_type.lower()
-        if "pdf" in file_type:
-            return ft.Icons.PICTURE_AS_PDF
-        elif "image" in file_type:
-            return ft.Icons.IMAGE
-        elif "word" in file_type:
-            return ft.Icons.DESCRIPTION
-        elif "excel" in file_type:
-            return ft.Icons.TABLE_CHART
-        elif "powerpoint" in file_type:
-            return ft.Icons.SLIDESHOW
-        elif "text" in file_type or "plain" in file_type:
-            return ft.Icons.TEXT_SNIPPET
-        elif "zip" in file_type or "compressed" in file_type:
-            return ft.Icons.ARCHIVE
-        else:
-            return ft.Icons.INSERT_DRIVE_FILE
+        return file_icon_for(file_type)
     
     def get_sync_icon(self, sync_status):
         """Get icon indicating sync status"""
@@ -435,8 +900,10 @@ class DocumentVault:
                 local_path, cloud_id = result
                 
                 # Delete local file
-                if local_path and os.path.exists(local_path):
-                    os.remove(local_path)
+                if local_path:
+                    with VaultLock(os.path.basename(local_path)):
+                        if os.path.exists(local_path):
+                            os.remove(local_path)
                 
                 # Delete from cloud if online and has cloud ID
                 if self.online and cloud_id:
@@ -452,6 +919,8 @@ class DocumentVault:
                 
                 # Delete from local database
                 cursor.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                if self.fts_enabled:
+                    cursor.execute("DELETE FROM files_fts WHERE file_id = ?", (file_id,))
                 self.local_db.commit()
                 
                 self.load_files()
@@ -562,6 +1031,25 @@ class DocumentVault:
                 self.sync_data()
             await asyncio.sleep(30)  # Check every 30 seconds
     
+    async def watch_vault_changes(self):
+        """Refresh the UI when another process commits to the vault database"""
+        cursor = self.local_db.cursor()
+        cursor.execute("PRAGMA data_version")
+        last_version = cursor.fetchone()[0]
+        while True:
+            await asyncio.sleep(CHANGE_POLL_INTERVAL)
+            try:
+                # data_version only moves for commits made by other connections
+                cursor.execute("PRAGMA data_version")
+                version = cursor.fetchone()[0]
+                if version != last_version:
+                    last_version = version
+                    self.load_folders()
+                    self.load_tags()
+                    self.load_files()
+            except Exception as e:
+                print(f"Error checking for vault changes: {e}")
+    
     def sync_data(self):
         """Sync local changes with cloud"""
         if not self.online or self.sync_in_progress:
@@ -589,15 +1077,168 @@ class DocumentVault:
             self.load_files()  # Refresh UI
             self.page.update()
     
+    async def run_extraction(self):
+        """Sniff and extract metadata for files awaiting extraction"""
+        while True:
+            try:
+                claim_token, batch = self.claim_extract_jobs()
+                if batch:
+                    # Keep the lease alive however long the batch takes
+                    renewer = asyncio.create_task(self.renew_extract_claim(claim_token))
+                    try:
+                        await asyncio.gather(*(self.extract_file(claim_token, *row) for row in batch))
+                    finally:
+                        renewer.cancel()
+                    self.load_files()
+                    continue
+            except Exception as e:
+                print(f"Error running extraction: {e}")
+            await asyncio.sleep(EXTRACT_POLL_INTERVAL)
+    
+    def claim_extract_jobs(self):
+        """Lease up to EXTRACT_BATCH_SIZE files awaiting extraction to this process.
+        
+        Returns (claim_token, rows). Batches whose lease outlives EXTRACT_LEASE
+        are treated as abandoned and become claimable again.
+        """
+        claim_token = f"{self.worker_id}:{uuid.uuid4().hex}"
+        now = time.time()
+        cursor = self.local_db.cursor()
+        # Same single-statement claim as claim_sync_job, so processes never share a row
+        cursor.execute('''
+            UPDATE files
+            SET extract_status = 'running', extract_claimed_by = ?, extract_expires = ?
+            WHERE id IN (
+                SELECT id FROM files
+                WHERE extract_status = 'pending'
+                    OR (extract_status = 'running' AND extract_expires < ?)
+                LIMIT ?
+            )
+        ''', (claim_token, now + EXTRACT_LEASE, now, EXTRACT_BATCH_SIZE))
+        self.local_db.commit()
+        
+        if cursor.rowcount == 0:
+            return None, []
+        cursor.execute(
+            "SELECT id, name, local_path FROM files WHERE extract_claimed_by = ?",
+            (claim_token,)
+        )
+        return claim_token, cursor.fetchall()
+    
+    async def renew_extract_claim(self, claim_token):
+        """Extend an extraction batch's lease every EXTRACT_RENEW_INTERVAL"""
+        cursor = self.local_db.cursor()
+        while True:
+            await asyncio.sleep(EXTRACT_RENEW_INTERVAL)
+            try:
+                cursor.execute('''
+                    UPDATE files SET extract_expires = ?
+                    WHERE extract_claimed_by = ? AND extract_status = 'running'
+                ''', (time.time() + EXTRACT_LEASE, claim_token))
+                self.local_db.commit()
+            except Exception as e:
+                print(f"Error renewing extraction claim: {e}")
+    
+    async def extract_file(self, claim_token, file_id, name, local_path):
+        """Extract one file, reusing cached results for identical content"""
+        loop = asyncio.get_running_loop()
+        cursor = self.local_db.cursor()
+        try:
+            # Hashing reads the whole file, so it runs in the niced pool too
+            content_hash = await loop.run_in_executor(self.extract_pool, hash_file, local_path)
+            cursor.execute(
+                "SELECT mime, page_count, width, height, text FROM extractions WHERE content_hash = ?",
+                (content_hash,)
+            )
+            cached = cursor.fetchone()
+            
+            if cached:
+                result = dict(zip(("mime", "page_count", "width", "height", "text"), cached))
+            elif content_hash in self.extract_inflight:
+                # Identical content is already being extracted in this batch
+                result = await self.extract_inflight[content_hash]
+            else:
+                future = loop.run_in_executor(self.extract_pool, extract_content, local_path)
+                self.extract_inflight[content_hash] = future
+                try:
+                    result = await future
+                finally:
+                    del self.extract_inflight[content_hash]
+                cursor.execute('''
+                    INSERT OR REPLACE INTO extractions (content_hash, mime, page_count, width, height, text)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (content_hash, result["mime"], result["page_count"], result["width"], result["height"], result["text"]))
+            
+            # The cache holds name-independent results; the name is applied per file
+            file_type = resolve_mime(result["mime"], name)
+            cursor.execute('''
+                UPDATE files
+                SET type = ?, content_hash = ?, page_count = ?, width = ?, height = ?,
+                    extracted_text = ?, extract_status = 'done',
+                    extract_claimed_by = NULL, extract_expires = NULL
+                WHERE id = ? AND extract_claimed_by = ?
+            ''', (file_type, content_hash, result["page_count"], result["width"],
+                  result["height"], result["text"], file_id, claim_token))
+            # Only the claim holder indexes the text, and a row is extracted once
+            if cursor.rowcount == 1 and self.fts_enabled and result["text"]:
+                cursor.execute(
+                    "INSERT INTO files_fts (file_id, text) VALUES (?, ?)",
+                    (file_id, result["text"])
+                )
+            self.local_db.commit()
+        except Exception as e:
+            print(f"Error extracting {name}: {e}")
+            cursor.execute('''
+                UPDATE files
+                SET extract_status = 'failed', extract_claimed_by = NULL, extract_expires = NULL
+                WHERE id = ? AND extract_claimed_by = ?
+            ''', (file_id, claim_token))
+            self.local_db.commit()
+    
+    def claim_sync_job(self, sync_status):
+        """Lease one file row with the given status to this worker.
+        
+        Returns (claim_token, row), or (None, None) when nothing is claimable.
+        Leases that outlive CLAIM_LEASE are treated as abandoned.
+        """
+        claim_token = f"{self.worker_id}:{uuid.uuid4().hex}"
+        now = time.time()
+        cursor = self.local_db.cursor()
+        # A single UPDATE is atomic in SQLite, so two workers never win the same row
+        cursor.execute('''
+            UPDATE files
+            SET claimed_by = ?, claim_expires = ?
+            WHERE id = (
+                SELECT id FROM files
+                WHERE sync_status = ? AND (claimed_by IS NULL OR claim_expires < ?)
+                LIMIT 1
+            )
+        ''', (claim_token, now + CLAIM_LEASE, sync_status, now))
+        self.local_db.commit()
+        
+        if cursor.rowcount == 0:
+            return None, None
+        cursor.execute(f"SELECT {FILE_COLUMNS} FROM files WHERE claimed_by = ?", (claim_token,))
+        return claim_token, cursor.fetchone()
+    
     def sync_new_files(self):
         """Upload new files to cloud"""
         cursor = self.local_db.cursor()
-        cursor.execute("SELECT * FROM files WHERE sync_status = 'new'")
-        new_files = cursor.fetchall()
         
-        for file in new_files:
+        while True:
+            claim_token, file = self.claim_sync_job("new")
+            if file is None:
+                break
             file_id, name, file_type, size, folder, tags, uploaded_at, local_path, _, _ = file
             
+            # Keep the lease alive for as long as the upload takes
+            stop_renewing = threading.Event()
+            renewer = threading.Thread(
+                target=self.renew_claim,
+                args=(file_id, claim_token, stop_renewing),
+                daemon=True
+            )
+            renewer.start()
             try:
                 # Upload to Appwrite Storage
                 with open(local_path, 'rb') as f:
@@ -607,6 +1248,12 @@ class DocumentVault:
                         file=InputFile.from_bytes(f.read(), filename=name)
                     )
                 
+                if not self.holds_claim(file_id, claim_token):
+                    # Another worker took this file over; drop our copy
+                    print(f"Lost claim on {name}, discarding upload")
+                    self.storage.delete_file(bucket_id='documents', file_id=result['$id'])
+                    continue
+                
                 # Add metadata to database
                 self.databases.create_document(
                     database_id='vault',
@@ -623,12 +1270,12 @@ class DocumentVault:
                     }
                 )
                 
-                # Update local record
+                # Update local record and release the claim
                 cursor.execute('''
                     UPDATE files 
-                    SET cloud_id = ?, sync_status = 'synced'
-                    WHERE id = ?
-                ''', (result['$id'], file_id))
+                    SET cloud_id = ?, sync_status = 'synced', claimed_by = NULL, claim_expires = NULL
+                    WHERE id = ? AND claimed_by = ?
+                ''', (result['$id'], file_id, claim_token))
                 self.local_db.commit()
                 
             except Exception as e:
@@ -636,10 +1283,39 @@ class DocumentVault:
                 # Mark as offline if sync failed
                 cursor.execute('''
                     UPDATE files 
-                    SET sync_status = 'offline'
-                    WHERE id = ?
-                ''', (file_id,))
+                    SET sync_status = 'offline', claimed_by = NULL, claim_expires = NULL
+                    WHERE id = ? AND claimed_by = ?
+                ''', (file_id, claim_token))
                 self.local_db.commit()
+            finally:
+                stop_renewing.set()
+                renewer.join()
+    
+    def renew_claim(self, file_id, claim_token, stop):
+        """Extend a claim's lease every CLAIM_RENEW_INTERVAL until stop is set"""
+        # A private connection, since the caller's is in use on another thread
+        db = sqlite3.connect(DB_NAME, timeout=30)
+        try:
+            while not stop.wait(CLAIM_RENEW_INTERVAL):
+                db.execute(
+                    "UPDATE files SET claim_expires = ? WHERE id = ? AND claimed_by = ?",
+                    (time.time() + CLAIM_LEASE, file_id, claim_token)
+                )
+                db.commit()
+        except Exception as e:
+            print(f"Error renewing claim on {file_id}: {e}")
+        finally:
+            db.close()
+    
+    def holds_claim(self, file_id, claim_token):
+        """Extend a claim's lease, or return False if another worker has taken it"""
+        cursor = self.local_db.cursor()
+        cursor.execute(
+            "UPDATE files SET claim_expires = ? WHERE id = ? AND claimed_by = ?",
+            (time.time() + CLAIM_LEASE, file_id, claim_token)
+        )
+        self.local_db.commit()
+        return cursor.rowcount == 1
     
     def sync_modified_files(self):
         """Sync files marked as modified"""
@@ -660,40 +1336,46 @@ class DocumentVault:
             )
             
             for doc in cloud_files['documents']:
-                # Check if we have this file locally
-                cursor = self.local_db.cursor()
-                cursor.execute("SELECT 1 FROM files WHERE id = ?", (doc['$id'],))
-                exists = cursor.fetchone()
-                
-                if not exists:
-                    # Download new file from cloud
-                    file_content = self.storage.get_file_download(
-                        bucket_id='documents',
-                        file_id=doc['storage_id']
-                    )
-                    
-                    # Save locally
-                    local_path = self.local_vault_path / f"{doc['$id']}_{doc['name']}"
-                    with open(local_path, 'wb') as f:
-                        f.write(file_content)
+                # Hold the document's lock so only one process downloads it
+                with VaultLock(f"doc_{doc['$id']}"):
+                    # Check if we have this file locally
+                    cursor = self.local_db.cursor()
+                    cursor.execute("SELECT 1 FROM files WHERE id = ?", (doc['$id'],))
+                    exists = cursor.fetchone()
                     
-                    # Add to local database
-                    cursor.execute('''
-                        INSERT INTO files (id, name, type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        doc['$id'],
-                        doc['name'],
-                        doc['type'],
-                        doc['size'],
-                        doc['folder'],
-                        ",".join(doc.get('tags', [])),
-                        doc['$createdAt'],
-                        str(local_path),
-                        doc['storage_id'],
-                        "synced"
-                    ))
-                    self.local_db.commit()
+                    if not exists:
+                        # Download new file from cloud
+                        file_content = self.storage.get_file_download(
+                            bucket_id='documents',
+                            file_id=doc['storage_id']
+                        )
+                        
+                        # Save locally, adding the row while the blob is still locked
+                        local_path = self.local_vault_path / f"{doc['$id']}_{doc['name']}"
+                        
+                        def record_file():
+                            cursor.execute('''
+                                INSERT INTO files (id, name, type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ''', (
+                                doc['$id'],
+                                doc['name'],
+                                doc['type'],
+                                doc['size'],
+                                doc['folder'],
+                                ",".join(doc.get('tags', [])),
+                                doc['$createdAt'],
+                                str(local_path),
+                                doc['storage_id'],
+                                "synced"
+                            ))
+                            self.local_db.commit()
+                        
+                        self.write_blob(
+                            local_path,
+                            lambda tmp_path: tmp_path.write_bytes(file_content),
+                            record_file
+                        )
         except Exception as e:
             print(f"Error downloading cloud changes: {e}")
     
@@ -706,7 +1388,368 @@ class DocumentVault:
             size /= 1024
         return f"{size:.1f} TB"
 
+
+class SyncWorker(DocumentVault):
+    """Headless worker that uploads queued files from a shared vault"""
+    def __init__(self):
+        self.online = False
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.init_local_storage()
+        self.init_appwrite_client()
+    
+    def run(self):
+        """Upload claimable files until the process is stopped"""
+        while True:
+            try:
+                self.storage.list_buckets()
+                self.online = True
+            except Exception as e:
+                print(f"Sync worker {self.worker_id} offline: {e}")
+                self.online = False
+            
+            if self.online:
+                self.sync_new_files()
+            time.sleep(WORKER_POLL_INTERVAL)
+
+
+class VaultScrubber(SyncWorker):
+    """Headless integrity check of vault rows, local blobs, and cloud copies"""
+    def __init__(self, repair=False, rate_limit=SCRUB_RATE_LIMIT, time_budget=None):
+        super().__init__()
+        self.repair = repair
+        self.limiter = RateLimiter(rate_limit * 1024 * 1024)
+        self.time_budget = time_budget
+        self.deadline = None
+        self.stop = threading.Event()
+        self.stats = Counter()
+        try:
+            self.storage.list_buckets()
+            self.online = True
+        except Exception as e:
+            print(f"Scrubbing offline, cloud copies will not be checked: {e}")
+            self.online = False
+    
+    def run(self):
+        """Verify files from the last checkpoint, then look for orphaned blobs"""
+        self.deadline = time.monotonic() + self.time_budget if self.time_budget else None
+        cursor = self.local_db.cursor()
+        cursor.execute("SELECT value FROM scrub_state WHERE key = 'last_id'")
+        row = cursor.fetchone()
+        last_id = row[0] if row else ""
+        if last_id:
+            print(f"Resuming scrub after file {last_id}")
+        
+        cursor.execute("SELECT local_path FROM files WHERE local_path IS NOT NULL")
+        referenced = {os.path.basename(path) for (path,) in cursor.fetchall()}
+        
+        with ThreadPoolExecutor(max_workers=SCRUB_WORKERS) as pool:
+            # The blob directory is walked alongside the row checks
+            orphans = pool.submit(self.find_orphans, referenced)
+            
+            while not self.stop.is_set():
+                cursor.execute(
+                    f"SELECT {FILE_COLUMNS}, content_hash FROM files WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, SCRUB_BATCH_SIZE)
+                )
+                batch = cursor.fetchall()
+                if not batch:
+                    # Pass complete, the next scrub starts from the beginning
+                    self.save_checkpoint("")
+                    break
+                
+                futures = [pool.submit(self.check_file, file) for file in batch]
+                # Results are taken in id order, so the checkpoint only ever
+                # covers an unbroken run of finished files
+                for file, future in zip(batch, futures):
+                    problem, sha256 = self.wait_for(future)
+                    if problem == "stopped":
+                        break
+                    self.stats[problem or "ok"] += 1
+                    if problem:
+                        self.handle_problem(file, problem)
+                    elif sha256 and not file[-1]:
+                        self.record_content_hash(file[0], sha256)
+                    last_id = file[0]
+                    self.save_checkpoint(last_id)
+                for future in futures:
+                    future.cancel()
+            
+            for path in self.wait_for(orphans):
+                self.stats["orphan"] += 1
+                self.handle_orphan(path)
+        
+        if self.stop.is_set():
+            print("Scrub time budget reached, progress saved")
+        print("Scrub summary: " + ", ".join(f"{key}={count}" for key, count in sorted(self.stats.items())))
+    
+    def wait_for(self, future):
+        """Wait for a scrub task, stopping all tasks once the time budget is spent"""
+        if self.deadline and not self.stop.is_set():
+            try:
+                return future.result(timeout=max(self.deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                self.stop.set()
+        return future.result()
+    
+    def save_checkpoint(self, last_id):
+        """Record the id of the last file verified, so the next scrub resumes after it"""
+        cursor = self.local_db.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO scrub_state (key, value) VALUES ('last_id', ?)",
+            (last_id,)
+        )
+        self.local_db.commit()
+    
+    def find_orphans(self, referenced):
+        """List blobs in the vault directory that no file row points at"""
+        orphans = []
+        cutoff = time.time() - SCRUB_ORPHAN_GRACE
+        with os.scandir(self.local_vault_path) as entries:
+            for entry in entries:
+                if self.stop.is_set():
+                    # Out of time; the orphans found so far are still real
+                    break
+                if not entry.is_file() or entry.name in referenced:
+                    continue
+                # Young blobs may belong to an add or download still in progress
+                if entry.stat().st_mtime < cutoff:
+                    orphans.append(Path(entry.path))
+        return orphans
+    
+    def check_file(self, file):
+        """Check one file row.
+        
+        Returns (problem, sha256): the first problem found or None, and the
+        local blob's SHA-256 if it was read.
+        """
+        file_id, name, file_type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status, content_hash = file
+        sha256 = None
+        if self.stop.is_set():
+            return "stopped", None
+        try:
+            if not local_path or not os.path.exists(local_path):
+                return "missing", None
+            if os.path.getsize(local_path) != size:
+                return "size_mismatch", None
+            sha256, md5 = file_digests(local_path, self.limiter, self.stop)
+            if content_hash and sha256 != content_hash:
+                return "hash_mismatch", sha256
+            
+            if self.online and cloud_id and sync_status == "synced":
+                try:
+                    cloud_file = self.storage.get_file(bucket_id='documents', file_id=cloud_id)
+                except AppwriteException as e:
+                    if e.code == 404:
+                        return "cloud_missing", sha256
+                    raise
+                if cloud_file['sizeOriginal'] != size or cloud_file.get('signature', md5) != md5:
+                    # Without a recorded hash we cannot tell which copy is right
+                    return ("cloud_mismatch" if content_hash else "conflict"), sha256
+            return None, sha256
+        except ScrubStopped:
+            return "stopped", None
+        except Exception as e:
+            print(f"Error checking {name}: {e}")
+            return "error", sha256
+    
+    def record_content_hash(self, file_id, sha256):
+        """Save a verified blob's hash so later scrubs can catch silent corruption"""
+        cursor = self.local_db.cursor()
+        cursor.execute(
+            "UPDATE files SET content_hash = ? WHERE id = ? AND content_hash IS NULL",
+            (sha256, file_id)
+        )
+        self.local_db.commit()
+    
+    def handle_problem(self, file, problem):
+        """Report a problem and, when repairing, fix it from the good copy"""
+        file_id, name, file_type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status, content_hash = file
+        print(f"{problem}: {name} ({file_id})")
+        if not self.repair or problem == "error":
+            return
+        
+        if problem == "conflict":
+            print(f"Cannot repair {name}: local and cloud copies differ and neither can be verified")
+            self.stats["unrepairable"] += 1
+        elif problem in ("cloud_missing", "cloud_mismatch"):
+            if self.online and self.reupload_file(file):
+                self.stats["reuploaded"] += 1
+            else:
+                self.stats["unrepairable"] += 1
+        elif self.online and cloud_id and sync_status == "synced":
+            if self.refetch_file(file_id, name, local_path, cloud_id, size, content_hash):
+                self.stats["refetched"] += 1
+            else:
+                self.stats["unrepairable"] += 1
+        else:
+            print(f"Cannot repair {name}: no cloud copy to restore from")
+            self.stats["unrepairable"] += 1
+    
+    def refetch_file(self, file_id, name, local_path, cloud_id, size, content_hash):
+        """Replace a missing or damaged local blob with its cloud copy.
+        
+        Returns False, leaving the local blob alone, if the cloud copy cannot be
+        downloaded or does not match the recorded size and content hash.
+        """
+        try:
+            file_content = self.storage.get_file_download(bucket_id='documents', file_id=cloud_id)
+        except Exception as e:
+            print(f"Cannot repair {name}: error downloading cloud copy: {e}")
+            return False
+        if len(file_content) != size or (
+            content_hash and hashlib.sha256(file_content).hexdigest() != content_hash
+        ):
+            print(f"Cannot repair {name}: cloud copy is damaged too")
+            return False
+        
+        local_path = Path(local_path) if local_path else self.local_vault_path / f"{file_id}_{name}"
+        self.write_blob(local_path, lambda tmp_path: tmp_path.write_bytes(file_content))
+        
+        cursor = self.local_db.cursor()
+        cursor.execute("UPDATE files SET local_path = ? WHERE id = ?", (str(local_path), file_id))
+        self.local_db.commit()
+        return True
+    
+    def reupload_file(self, file):
+        """Replace a missing or bad cloud copy with the verified local blob.
+        
+        The new copy is uploaded and recorded before the old one is deleted,
+        so a failed upload never leaves the file without a cloud copy.
+        """
+        file_id, name, file_type, size, folder, tags, uploaded_at, local_path, cloud_id, sync_status, _ = file
+        try:
+            with open(local_path, 'rb') as f:
+                result = self.storage.create_file(
+                    bucket_id='documents',
+                    file_id=ID.unique(),
+                    file=InputFile.from_bytes(f.read(), filename=name)
+                )
+        except Exception as e:
+            print(f"Cannot repair {name}: error uploading local copy: {e}")
+            return False
+        
+        try:
+            try:
+                self.databases.update_document(
+                    database_id='vault',
+                    collection_id='files',
+                    document_id=file_id,
+                    data={'storage_id': result['$id']}
+                )
+            except AppwriteException as e:
+                if e.code != 404:
+                    raise
+                self.databases.create_document(
+                    database_id='vault',
+                    collection_id='files',
+                    document_id=file_id,
+                    data={
+                        'name': name,
+                        'type': file_type,
+                        'size': size,
+                        'folder': folder,
+                        'tags': tags.split(",") if tags else [],
+                        'uploaded_at': uploaded_at,
+                        'storage_id': result['$id']
+                    }
+                )
+        except Exception as e:
+            print(f"Cannot repair {name}: error updating cloud document: {e}")
+            try:
+                self.storage.delete_file(bucket_id='documents', file_id=result['$id'])
+            except Exception as cleanup_err:
+                print(f"Error deleting unused upload {result['$id']}: {cleanup_err}")
+            return False
+        
+        cursor = self.local_db.cursor()
+        cursor.execute(
+            "UPDATE files SET cloud_id = ?, sync_status = 'synced' WHERE id = ?",
+            (result['$id'], file_id)
+        )
+        self.local_db.commit()
+        
+        # The new copy is in place, so the old one can go
+        try:
+            self.storage.delete_file(bucket_id='documents', file_id=cloud_id)
+        except AppwriteException as e:
+            if e.code != 404:
+                print(f"Error deleting old cloud copy {cloud_id}: {e}")
+        except Exception as e:
+            print(f"Error deleting old cloud copy {cloud_id}: {e}")
+        return True
+    
+    def handle_orphan(self, path):
+        """Report an orphaned blob and, when repairing, delete it"""
+        print(f"orphan: {path}")
+        if not self.repair:
+            return
+        # write_blob's temp files are named .<blob>.part
+        is_partial = path.name.startswith(".") and path.name.endswith(".part")
+        blob_name = path.name[1:-len(".part")] if is_partial else path.name
+        with VaultLock(blob_name):
+            # Nothing writes a leftover .part file once its lock is free.
+            # For a blob, re-check under the lock in case a row was added since
+            # the scan, matching by basename like find_orphans does.
+            if not is_partial:
+                pattern = "%" + re.sub(r"([!%_])", r"!\1", blob_name)
+                cursor = self.local_db.cursor()
+                cursor.execute("SELECT local_path FROM files WHERE local_path LIKE ? ESCAPE '!'", (pattern,))
+                if any(os.path.basename(row[0]) == blob_name for row in cursor.fetchall()):
+                    return
+            if path.exists():
+                path.unlink()
+                self.stats["orphan_removed"] += 1
+
+
+def run_sync_worker():
+    SyncWorker().run()
+
 def main(page: ft.Page):
     DocumentVault(page)
 
-ft.app(target=main)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=APP_NAME)
+    parser.add_argument(
+        "--sync-workers",
+        type=int,
+        default=0,
+        help="run N headless sync worker processes instead of the UI"
+    )
+    parser.add_argument(
+        "--scrub",
+        action="store_true",
+        help="verify vault files against the database and cloud, then exit"
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="with --scrub, re-fetch or re-upload damaged files and delete orphans"
+    )
+    parser.add_argument(
+        "--scrub-rate",
+        type=float,
+        default=SCRUB_RATE_LIMIT,
+        help="maximum scrub read rate in MB/s (0 for unlimited)"
+    )
+    parser.add_argument(
+        "--scrub-seconds",
+        type=float,
+        default=None,
+        help="stop scrubbing after this many seconds; the next scrub resumes"
+    )
+    args = parser.parse_args()
+    
+    if args.scrub:
+        VaultScrubber(
+            repair=args.repair,
+            rate_limit=args.scrub_rate,
+            time_budget=args.scrub_seconds
+        ).run()
+    elif args.sync_workers > 0:
+        workers = [multiprocessing.Process(target=run_sync_worker) for _ in range(args.sync_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    else:
+        ft.app(target=main)